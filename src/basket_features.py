@@ -0,0 +1,204 @@
+"""
+Basket Features Module
+Customer x product sparse matrix features (TF-IDF + truncated SVD, category spend shares)
+"""
+
+import logging
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfTransformer
+
+from customer_hashing import hash_test_mask
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+COMPONENT_PREFIX = 'BasketComponent_'
+CATEGORY_SHARE_PREFIX = 'CategoryShare_'
+
+
+def requested_basket_features(params):
+    """Basket feature names listed in feature_engineering.features
+
+    Raises ValueError for names beyond the configured ``n_components`` /
+    ``n_categories`` (e.g. ``BasketComponent_9`` with 8 components).
+    """
+    requested = [
+        f for f in params['feature_engineering']['features']
+        if f.startswith((COMPONENT_PREFIX, CATEGORY_SHARE_PREFIX))
+    ]
+    if requested:
+        config = params['feature_engineering']['basket']
+        valid = set(_feature_names(config['n_components'], config['n_categories']))
+        invalid = [f for f in requested if f not in valid]
+        if invalid:
+            raise ValueError(
+                f"Unknown basket features {invalid}: feature_engineering.basket defines "
+                f"{config['n_components']} components and {config['n_categories']} categories"
+            )
+    return requested
+
+
+def _feature_names(n_components, n_categories):
+    """Output column names for the given number of components and categories"""
+    return ([f'{COMPONENT_PREFIX}{i + 1}' for i in range(n_components)]
+            + [f'{CATEGORY_SHARE_PREFIX}{i + 1}' for i in range(n_categories)])
+
+
+def fit_customer_mask(customer_ids, params):
+    """Customers the transform is fitted on: the hash-split train customers, or all customers
+
+    With ``data.split_method: hash`` the test customers are already known here
+    (``customer_hashing.hash_test_mask``, the rule the split itself uses) and
+    are left out of the fit. The stratified split is only drawn after feature
+    engineering, so the (label-free) transform is then fitted on every customer.
+    """
+    if params['data'].get('split_method', 'stratified') != 'hash':
+        return np.ones(len(customer_ids), dtype=bool)
+    return ~hash_test_mask(customer_ids, params)
+
+
+def _sparse_by_customer(customer_codes, column_codes, values, n_customers, n_columns):
+    """Build a CSR matrix in one pass, summing duplicate (customer, column) entries"""
+    return sparse.coo_matrix(
+        (values, (customer_codes, column_codes)), shape=(n_customers, n_columns)
+    ).tocsr()
+
+
+def _factorize_stock_codes(df):
+    """Per-row codes into the distinct StockCodes, with those codes as strings
+
+    String conversion and lookups then happen once per distinct code instead of
+    once per transaction line.
+    """
+    codes, uniques = pd.factorize(df['StockCode'])
+    return codes, pd.Index(uniques).astype(str)
+
+
+def _lookup(codes, uniques, index):
+    """Map per-row codes to positions in ``index`` (-1 where missing)"""
+    return index.get_indexer(uniques)[codes]
+
+
+def build_customer_product_matrix(df, stock_vocabulary):
+    """Customer x StockCode purchase-count matrix for codes in ``stock_vocabulary``
+
+    Returns the CSR matrix and the (sorted) CustomerIDs of its rows. Stock codes
+    not present in the vocabulary are ignored.
+    """
+    customer_codes, customer_ids = pd.factorize(df['CustomerID'], sort=True)
+    stock_codes = _lookup(*_factorize_stock_codes(df), stock_vocabulary)
+    known = stock_codes >= 0
+
+    matrix = _sparse_by_customer(
+        customer_codes[known], stock_codes[known], np.ones(known.sum(), dtype=np.float32),
+        len(customer_ids), len(stock_vocabulary),
+    )
+    return matrix, customer_ids
+
+
+def _category_codes(df, prefix_len):
+    """Per-row codes into the coarse product categories (leading StockCode characters)"""
+    codes, uniques = _factorize_stock_codes(df)
+    category_codes, categories = pd.factorize(uniques.str[:prefix_len])
+    return category_codes[codes], pd.Index(categories)
+
+
+def fit_basket_transform(df, params):
+    """Fit the TF-IDF + truncated SVD transform and pick the top spend categories"""
+    config = params['feature_engineering']['basket']
+
+    fit_rows = fit_customer_mask(df['CustomerID'].to_numpy(), params)
+    if not fit_rows.all():
+        df = df[fit_rows]
+        logger.info(f"Fitting basket transform on {df['CustomerID'].nunique()} train customers")
+
+    stock_vocabulary = _factorize_stock_codes(df)[1].sort_values()
+    matrix, _ = build_customer_product_matrix(df, stock_vocabulary)
+    logger.info(f"Customer x product matrix: {matrix.shape}, {matrix.nnz} non-zeros "
+                f"({matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes} bytes)")
+
+    tfidf = TfidfTransformer(sublinear_tf=True)
+    weighted = tfidf.fit_transform(matrix)
+
+    n_components = min(config['n_components'], matrix.shape[1] - 1)
+    svd = TruncatedSVD(n_components=n_components, random_state=params['data']['random_state'])
+    svd.fit(weighted)
+    logger.info(f"Truncated SVD explained variance: {svd.explained_variance_ratio_.sum():.4f}")
+
+    category_codes, categories = _category_codes(df, config['category_prefix_len'])
+    category_spend = pd.Series(
+        np.bincount(category_codes, weights=df['TotalPrice'].to_numpy(dtype=np.float64)), index=categories
+    )
+    top_categories = category_spend.nlargest(config['n_categories']).index.tolist()
+
+    return {
+        'stock_vocabulary': stock_vocabulary,
+        'tfidf': tfidf,
+        'svd': svd,
+        'category_prefix_len': config['category_prefix_len'],
+        'top_categories': top_categories,
+        'n_components': config['n_components'],
+        'n_categories': config['n_categories'],
+    }
+
+
+def transform_basket_features(df, transform):
+    """Apply a fitted basket transform, returning one row per CustomerID"""
+    matrix, customer_ids = build_customer_product_matrix(df, transform['stock_vocabulary'])
+    components = transform['svd'].transform(transform['tfidf'].transform(matrix))
+
+    # Small catalogues can give fewer SVD components than configured; pad with zeros
+    # so every configured feature name exists
+    n_components = transform.get('n_components', components.shape[1])
+    padded = np.zeros((len(customer_ids), n_components), dtype=np.float32)
+    padded[:, :components.shape[1]] = components
+    features = pd.DataFrame(padded, columns=_feature_names(n_components, 0))
+    features.insert(0, 'CustomerID', customer_ids)
+
+    # Spend share of each top category (sparse customer x category spend matrix)
+    customer_codes = pd.factorize(df['CustomerID'], sort=True)[0]
+    categories = pd.Index(transform['top_categories'])
+    category_codes = _lookup(*_category_codes(df, transform['category_prefix_len']), categories)
+    known = category_codes >= 0
+    spend = df['TotalPrice'].to_numpy(dtype=np.float64)
+    category_spend = _sparse_by_customer(
+        customer_codes[known], category_codes[known], spend[known], len(customer_ids), len(categories),
+    ).toarray()
+    total_spend = np.bincount(customer_codes, weights=spend, minlength=len(customer_ids))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.where(total_spend[:, None] > 0, category_spend / total_spend[:, None], 0.0)
+    n_categories = transform.get('n_categories', len(categories))
+    for i in range(n_categories):
+        features[f'{CATEGORY_SHARE_PREFIX}{i + 1}'] = (
+            shares[:, i].astype(np.float32) if i < len(categories) else np.float32(0)
+        )
+
+    return features
+
+
+def save_basket_transform(transform, params):
+    """Persist the fitted basket transform (``None`` when no basket features were computed)
+
+    The file is a DVC output of preprocessing, so it is written on every run.
+    """
+    transform_path = params['feature_engineering']['basket']['transform_path']
+    os.makedirs(os.path.dirname(transform_path), exist_ok=True)
+    joblib.dump(transform, transform_path)
+    logger.info(f"Basket transform saved to {transform_path}")
+
+
+def create_basket_features(df, params):
+    """Fit, persist and apply the basket transform"""
+    logger.info("Creating basket composition features...")
+
+    transform = fit_basket_transform(df, params)
+    save_basket_transform(transform, params)
+
+    return transform_basket_features(df, transform)
@@ -0,0 +1,195 @@
+"""
+Benchmark Module
+Runs pipeline stages on synthetic data at several scales and flags regressions against a stored baseline
+"""
+
+import argparse
+import copy
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from synthetic_data import generate_transactions
+from data_preprocessing import clean_data, create_customer_features, create_cadence_features
+from basket_features import create_basket_features
+from feature_engineering import select_features, split_data, scale_features
+from model_training import get_model
+from model_evaluation import evaluate_model, cross_validate_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_params(params_path='params.yaml'):
+    """Load parameters from yaml file"""
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def measure_stage(func, *args, repeats=1, **kwargs):
+    """Run a function, returning its result and wall time / peak traced memory
+
+    Timing and memory come from separate runs: tracemalloc hooks every
+    allocation and would inflate (unevenly) any wall time measured under it.
+    The wall time is the best of ``repeats`` untraced runs.
+    """
+    wall_time = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    record = {
+        'wall_time_s': round(wall_time, 4),
+        'peak_mem_mb': round(peak / (1024 * 1024), 2),
+    }
+    return result, record
+
+
+def run_size(n_rows, params):
+    """Run every stage once on ``n_rows`` synthetic transactions"""
+    results = {}
+    seed = params['benchmark'].get('seed', 42)
+    measure = functools.partial(measure_stage, repeats=params['benchmark'].get('repeats', 1))
+
+    raw, results['generate_data'] = measure(generate_transactions, n_rows, seed=seed)
+    df_clean, results['clean_data'] = measure(clean_data, raw, params)
+    del raw
+
+    customers, results['create_customer_features'] = measure(create_customer_features, df_clean, params)
+    # Cadence features on their own, to compare against the base aggregation above
+    _, results['create_cadence_features'] = measure(
+        create_cadence_features, df_clean, df_clean['InvoiceDate'].max()
+    )
+    # Sparse basket features, with the size a dense customer x product pivot would need
+    _, results['create_basket_features'] = measure(create_basket_features, df_clean, params)
+    results['create_basket_features']['dense_pivot_mb'] = round(
+        df_clean['CustomerID'].nunique() * df_clean['StockCode'].nunique() * 8 / (1024 * 1024), 2
+    )
+    del df_clean
+
+    (X, y), results['select_features'] = measure(select_features, customers, params)
+    (X_train, X_test, y_train, y_test), results['split_data'] = measure(
+        split_data, X, y, params, customer_ids=customers['CustomerID']
+    )
+    (X_train, X_test, _), results['scale_features'] = measure(scale_features, X_train, X_test, params)
+
+    model, _ = get_model(params)
+    _, results['train_model'] = measure(model.fit, X_train, y_train)
+    _, results['evaluate_model'] = measure(evaluate_model, model, X_test, y_test, params)
+    _, results['cross_validate_model'] = measure(cross_validate_model, model, X_train, y_train, params)
+
+    return results
+
+
+def run_benchmarks(params, sizes):
+    """Run the benchmark suite for each size
+
+    Stages write their artifacts (e.g. ``models/scaler.pkl``) relative to the
+    working directory, so the suite runs inside a temporary directory to keep
+    the real pipeline outputs untouched.
+    """
+    params = copy.deepcopy(params)
+    params.setdefault('profiling', {})['enabled'] = False
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            for n_rows in sizes:
+                logger.info(f"Running benchmark with {n_rows} rows...")
+                results[str(n_rows)] = run_size(n_rows, params)
+                for stage, record in results[str(n_rows)].items():
+                    logger.info(f"{n_rows} rows - {stage}: {record}")
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance, min_time_s=0.05):
+    """Return a list of regressions (time or memory above baseline * (1 + tolerance))"""
+    regressions = []
+    for size, stages in results.items():
+        for stage, record in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+
+            if (record['wall_time_s'] >= min_time_s
+                    and record['wall_time_s'] > reference['wall_time_s'] * (1 + tolerance)):
+                regressions.append(
+                    f"{size} rows - {stage}: wall time {record['wall_time_s']}s "
+                    f"vs baseline {reference['wall_time_s']}s"
+                )
+            if record['peak_mem_mb'] > reference['peak_mem_mb'] * (1 + tolerance):
+                regressions.append(
+                    f"{size} rows - {stage}: peak memory {record['peak_mem_mb']}MB "
+                    f"vs baseline {reference['peak_mem_mb']}MB"
+                )
+    return regressions
+
+
+def save_results(results, output_path):
+    """Save benchmark results to JSON file"""
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=4)
+    logger.info(f"Benchmark results saved to {output_path}")
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Run the pipeline scaling benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', help="Row counts to benchmark (overrides params.yaml)")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    params = load_params()
+    config = params['benchmark']
+    sizes = args.sizes or config['sizes']
+    baseline_path = os.path.abspath(config['baseline_path'])
+    output_path = os.path.abspath(config['output_path'])
+
+    results = run_benchmarks(params, sizes)
+    save_results(results, output_path)
+
+    if args.update_baseline or not os.path.exists(baseline_path):
+        save_results(results, baseline_path)
+        logger.info("Baseline updated")
+        return
+
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = compare_to_baseline(results, baseline, config['regression_tolerance'])
+    if regressions:
+        logger.error("Performance regressions detected:")
+        for regression in regressions:
+            logger.error(f"  {regression}")
+        sys.exit(1)
+
+    logger.info("No performance regressions detected")
+
+
+if __name__ == "__main__":
+    main()
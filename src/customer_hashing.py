@@ -0,0 +1,31 @@
+"""
+Customer Hashing Module
+Seeded, deterministic hashing of CustomerIDs for stable customer-level assignment
+"""
+
+import numpy as np
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def customer_hash_unit(customer_ids, seed):
+    """Map CustomerIDs to deterministic pseudo-random floats in [0, 1)
+
+    Uses the SplitMix64 finalizer on the integer CustomerID mixed with the seed,
+    so a customer's value depends only on its ID and the seed: it is identical
+    across runs, chunks and incremental data refreshes.
+    """
+    ids = np.asarray(customer_ids).astype(np.int64).astype(np.uint64)
+    z = ids + np.uint64((seed * _GOLDEN_GAMMA + _GOLDEN_GAMMA) & _MASK64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    # Top 53 bits -> uniform double in [0, 1)
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def hash_test_mask(customer_ids, params):
+    """Boolean mask of rows assigned to the test set by a seeded hash of CustomerID"""
+    unit = customer_hash_unit(customer_ids, params['data']['random_state'])
+    return unit < params['data']['test_size']
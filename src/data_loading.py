@@ -8,6 +8,9 @@ import pandas as pd
 import yaml
 import urllib.request
 import logging
+from profiling import profile_stage
+from synthetic_data import generate_transactions
+from data_profiling import log_data_profile
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,22 +37,27 @@ def download_data(url, output_path):
     logger.info(f"Data downloaded successfully")
 
 
+@profile_stage
 def load_raw_data(params):
     """Load raw data and perform initial checks"""
     raw_path = params['data']['raw_data_path']
     dataset_url = params['data']['dataset_url']
+    synthetic_rows = params['data'].get('synthetic_rows')
     
     # Create directory if not exists
     os.makedirs(os.path.dirname(raw_path), exist_ok=True)
     
-    # Download if not exists
+    # Download if not exists (skipped when generating synthetic data)
     xlsx_path = raw_path.replace('.csv', '.xlsx')
-    if not os.path.exists(xlsx_path) and not os.path.exists(raw_path):
+    if not synthetic_rows and not os.path.exists(xlsx_path) and not os.path.exists(raw_path):
         download_data(dataset_url, raw_path)
     
     # Load data
     try:
-        if os.path.exists(xlsx_path):
+        if synthetic_rows:
+            logger.info("Using synthetic data instead of the UCI dataset")
+            df = generate_transactions(int(synthetic_rows), seed=params['data']['random_state'])
+        elif os.path.exists(xlsx_path):
             logger.info(f"Loading data from {xlsx_path}")
             df = pd.read_excel(xlsx_path, engine='openpyxl')
             # Save as CSV for easier processing
@@ -64,9 +72,7 @@ def load_raw_data(params):
     
     logger.info(f"Data loaded successfully. Shape: {df.shape}")
     logger.info(f"Columns: {df.columns.tolist()}")
-    logger.info(f"\nFirst few rows:\n{df.head()}")
-    logger.info(f"\nData types:\n{df.dtypes}")
-    logger.info(f"\nMissing values:\n{df.isnull().sum()}")
+    log_data_profile(df, 'load_raw_data', params)
     
     return df
 
@@ -9,11 +9,23 @@ import yaml
 import logging
 import os
 from datetime import datetime, timedelta
+from profiling import profile_stage
+from data_profiling import log_data_profile
+from basket_features import requested_basket_features, create_basket_features, save_basket_transform
+from customer_hashing import customer_hash_unit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Purchase-cadence features, computed only when listed in feature_engineering.features
+CADENCE_WINDOWS = [30, 90, 180]
+CADENCE_FEATURES = [
+    'MeanInterPurchaseGap',
+    'StdInterPurchaseGap',
+    'LastInterPurchaseGap',
+] + [f'Purchases{days}d' for days in CADENCE_WINDOWS]
+
 
 def load_params(params_path='params.yaml'):
     """Load parameters from yaml file"""
@@ -22,6 +34,26 @@ def load_params(params_path='params.yaml'):
     return params
 
 
+def sample_customers(df, params):
+    """Keep the transactions of a seeded-hash sample of ``data.sample_fraction`` of customers
+
+    Whole customers are kept or dropped, so per-customer features keep their
+    meaning. The seed is offset from ``data.random_state`` so the sample is
+    independent of the hash train/test split.
+    """
+    fraction = params['data'].get('sample_fraction', 1.0)
+    if fraction >= 1.0:
+        return df
+
+    n_customers = df['CustomerID'].nunique()
+    keep = customer_hash_unit(df['CustomerID'].to_numpy(), params['data']['random_state'] + 1) < fraction
+    df = df[keep]
+    logger.info(f"Sampled {df['CustomerID'].nunique()} of {n_customers} customers "
+                f"(sample_fraction={fraction}): {df.shape}")
+    return df
+
+
+@profile_stage
 def clean_data(df, params):
     """Clean and prepare data"""
     logger.info("Starting data cleaning...")
@@ -39,6 +71,9 @@ def clean_data(df, params):
     df = df.dropna(subset=['CustomerID'])
     logger.info(f"After removing missing CustomerID: {df.shape}")
     
+    # Development mode: subsample customers before any further work
+    df = sample_customers(df, params)
+    
     # Remove cancelled orders (InvoiceNo starting with 'C')
     df = df[~df['InvoiceNo'].astype(str).str.startswith('C')]
     logger.info(f"After removing cancelled orders: {df.shape}")
@@ -69,6 +104,7 @@ def clean_data(df, params):
     return df
 
 
+@profile_stage
 def create_customer_features(df, params):
     """Create customer-level features for prediction"""
     logger.info("Creating customer features...")
@@ -108,18 +144,214 @@ def create_customer_features(df, params):
     # Drop intermediate columns
     customer_features = customer_features.drop(['FirstPurchase', 'LastPurchase', 'TotalQuantity'], axis=1)
     
+    # Purchase-cadence features (only those requested in params)
+    requested_cadence = [f for f in CADENCE_FEATURES if f in params['feature_engineering']['features']]
+    if requested_cadence:
+        cadence_features = create_cadence_features(df, reference_date)
+        customer_features = customer_features.merge(
+            cadence_features[['CustomerID'] + requested_cadence], on='CustomerID'
+        )
+    
+    # Basket composition features (only those requested in params)
+    requested_basket = requested_basket_features(params)
+    if requested_basket:
+        basket_features = create_basket_features(df, params)
+        customer_features = customer_features.merge(
+            basket_features[['CustomerID'] + requested_basket], on='CustomerID'
+        )
+    
     # Create target variable: Will the customer purchase in the future?
     # We'll use a simple heuristic: customers with recent purchases (< 90 days) are likely to purchase again
     customer_features['WillPurchase'] = (customer_features['Recency'] < 90).astype(int)
     
     logger.info(f"Created features for {len(customer_features)} customers")
     logger.info(f"Feature columns: {customer_features.columns.tolist()}")
-    logger.info(f"\nTarget distribution:\n{customer_features['WillPurchase'].value_counts()}")
-    logger.info(f"\nFeature statistics:\n{customer_features.describe()}")
+    log_data_profile(customer_features, 'create_customer_features', params)
     
     return customer_features
 
 
+def create_cadence_features(df, reference_date):
+    """Inter-purchase timing features per customer using segmented array reductions
+
+    Invoices are sorted once by (CustomerID, InvoiceDate); gaps come from
+    ``np.diff`` over the sorted dates and per-customer statistics from
+    ``np.add.reduceat`` over each customer's contiguous segment. Gaps are in
+    days; customers with a single invoice get NaN gap statistics.
+    """
+    logger.info("Creating purchase cadence features...")
+
+    invoices = df[['CustomerID', 'InvoiceNo', 'InvoiceDate']].drop_duplicates(subset=['CustomerID', 'InvoiceNo'])
+    customer_codes, customer_ids = pd.factorize(invoices['CustomerID'], sort=True)
+    times = invoices['InvoiceDate'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+    order = np.lexsort((times, customer_codes))
+    customer_codes = customer_codes[order]
+    times = times[order]
+
+    # Segment boundaries: index of each customer's first invoice
+    starts = np.flatnonzero(np.r_[True, customer_codes[1:] != customer_codes[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    n_gaps = ends - starts
+
+    # Gap to the previous invoice of the same customer (0 at segment starts)
+    gaps = np.diff(times, prepend=times[0]).astype(np.float64) / 86400
+    gaps[starts] = 0.0
+
+    gap_sum = np.add.reduceat(gaps, starts)
+    gap_sq_sum = np.add.reduceat(gaps ** 2, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_gap = np.where(n_gaps > 0, gap_sum / n_gaps, np.nan)
+        std_gap = np.where(n_gaps > 0, np.sqrt(np.maximum(gap_sq_sum / n_gaps - mean_gap ** 2, 0.0)), np.nan)
+    last_gap = np.where(n_gaps > 0, gaps[ends], np.nan)
+
+    cadence_features = pd.DataFrame({
+        'CustomerID': customer_ids,
+        'MeanInterPurchaseGap': mean_gap,
+        'StdInterPurchaseGap': std_gap,
+        'LastInterPurchaseGap': last_gap,
+    })
+
+    # Invoices within the last N days of the reference date
+    reference_s = np.datetime64(reference_date, 's').astype(np.int64)
+    for days in CADENCE_WINDOWS:
+        in_window = (reference_s - times < days * 86400).astype(np.int64)
+        cadence_features[f'Purchases{days}d'] = np.add.reduceat(in_window, starts)
+
+    return cadence_features
+
+
+def _counts_before(sorted_keys, customer_starts, query_keys):
+    """Number of each customer's events strictly before the queried time
+
+    ``sorted_keys`` encode (customer, time) so every customer's events form one
+    contiguous, time-ordered segment starting at ``customer_starts``.
+    """
+    return np.searchsorted(sorted_keys, query_keys, side='left') - customer_starts
+
+
+def get_snapshot_cutoffs(df, params):
+    """Cutoff dates for snapshot generation, leaving a full label horizon after the last one"""
+    config = params['preprocessing']['snapshots']
+    horizon = pd.Timedelta(days=config['horizon_days'])
+    last_cutoff = (df['InvoiceDate'].max() - horizon).normalize()
+    cutoffs = pd.date_range(end=last_cutoff, periods=config['n_cutoffs'], freq=config.get('frequency', 'MS'))
+    return cutoffs[cutoffs > df['InvoiceDate'].min()]
+
+
+@profile_stage
+def create_snapshot_features(df, params, cutoffs=None):
+    """Create point-in-time customer features for many cutoff dates in one sorted pass
+
+    For each cutoff, features use only transactions strictly before the cutoff
+    and ``WillPurchase`` is 1 if the customer places an invoice within
+    ``horizon_days`` after it. Transactions are sorted once by (CustomerID,
+    InvoiceDate); per-customer cumulative arrays are then indexed with
+    ``searchsorted`` for every cutoff instead of re-running the groupby.
+    """
+    logger.info("Creating snapshot customer features...")
+
+    config = params['preprocessing']['snapshots']
+    unsupported = ([f for f in CADENCE_FEATURES if f in params['feature_engineering']['features']]
+                   + requested_basket_features(params))
+    if unsupported:
+        logger.warning(f"Cadence and basket features are not computed in snapshot mode; "
+                       f"ignoring requested features: {unsupported}")
+    if cutoffs is None:
+        cutoffs = get_snapshot_cutoffs(df, params)
+    cutoffs = pd.DatetimeIndex(cutoffs)
+    horizon_s = int(config['horizon_days']) * 86400
+    logger.info(f"Generating {len(cutoffs)} snapshots from {cutoffs.min()} to {cutoffs.max()}")
+
+    # Encode customers and times as integers (seconds relative to the first transaction)
+    customer_codes, customer_ids = pd.factorize(df['CustomerID'], sort=True)
+    dates = df['InvoiceDate'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    t0 = dates.min()
+    times = dates - t0
+    span = int(times.max()) + 2
+    n_customers = len(customer_ids)
+
+    # Single sort of all lines by (customer, time)
+    order = np.lexsort((times, customer_codes))
+    line_customers = customer_codes[order]
+    line_times = times[order]
+    line_keys = line_customers.astype(np.int64) * span + line_times
+
+    # Invoices and first purchase of each (customer, product) pair, taken from the sorted lines
+    invoice_codes = pd.factorize(df['InvoiceNo'])[0][order]
+    _, invoice_first = np.unique(invoice_codes, return_index=True)
+    invoice_keys = np.sort(line_keys[invoice_first])
+
+    stock_codes, stock_uniques = pd.factorize(df['StockCode'])
+    pair_codes = line_customers.astype(np.int64) * len(stock_uniques) + stock_codes[order]
+    _, pair_first = np.unique(pair_codes, return_index=True)
+    pair_keys = np.sort(line_keys[pair_first])
+
+    # Cumulative sums along the sorted lines (prefixed with 0 for segment differences)
+    cum_price = np.concatenate([[0.0], np.cumsum(df['TotalPrice'].to_numpy(dtype=np.float64)[order])])
+    cum_quantity = np.concatenate([[0.0], np.cumsum(df['Quantity'].to_numpy(dtype=np.float64)[order])])
+
+    customer_base = np.arange(n_customers, dtype=np.int64) * span
+    line_starts = np.searchsorted(line_keys, customer_base, side='left')
+    invoice_starts = np.searchsorted(invoice_keys, customer_base, side='left')
+    pair_starts = np.searchsorted(pair_keys, customer_base, side='left')
+
+    # Query grid: one row per cutoff, one column per customer
+    cutoff_s = (cutoffs.values.astype('datetime64[s]').astype(np.int64) - t0)
+    cutoff_times = np.clip(cutoff_s, 0, span - 1)[:, None]
+    horizon_times = np.clip(cutoff_s + horizon_s, 0, span - 1)[:, None]
+    query = customer_base[None, :] + cutoff_times
+    horizon_query = customer_base[None, :] + horizon_times
+
+    line_pos = np.searchsorted(line_keys, query, side='left')
+    n_lines = line_pos - line_starts
+    frequency = _counts_before(invoice_keys, invoice_starts, query)
+    future_invoices = _counts_before(invoice_keys, invoice_starts, horizon_query) - frequency
+    unique_products = _counts_before(pair_keys, pair_starts, query)
+
+    active = n_lines > 0
+    snapshot_idx, customer_idx = np.nonzero(active)
+    pos = line_pos[active]
+    starts = line_starts[customer_idx]
+    cutoff_at = cutoff_times[snapshot_idx, 0]
+
+    monetary = cum_price[pos] - cum_price[starts]
+    quantity = cum_quantity[pos] - cum_quantity[starts]
+    lines = n_lines[active]
+    invoices = frequency[active]
+
+    snapshot_features = pd.DataFrame({
+        'CustomerID': customer_ids[customer_idx],
+        'SnapshotDate': cutoffs[snapshot_idx],
+        'Recency': (cutoff_at - line_times[pos - 1]) // 86400,
+        'Frequency': invoices,
+        'Monetary': monetary,
+        'AvgPurchaseValue': monetary / lines,
+        'UniqueProducts': unique_products[active],
+        'DaysSinceFirstPurchase': (cutoff_at - line_times[starts]) // 86400,
+        'QuantityPerOrder': quantity / invoices,
+        'WillPurchase': (future_invoices[active] > 0).astype(int),
+    })
+
+    logger.info(f"Created {len(snapshot_features)} snapshot rows for {n_customers} customers")
+    log_data_profile(snapshot_features, 'create_snapshot_features', params)
+
+    return snapshot_features
+
+
+def add_segment_column(customer_features, df, params):
+    """Attach each customer's segment (e.g. Country) when per-segment models are enabled"""
+    config = params['model'].get('segmentation', {})
+    if not config.get('enabled', False):
+        return customer_features
+    
+    column = config['column']
+    # A customer's segment is taken from their first transaction
+    segments = df.groupby('CustomerID')[column].first().astype(str)
+    logger.info(f"Segment column '{column}': {segments.nunique()} segments")
+    return customer_features.merge(segments.reset_index(), on='CustomerID', how='left')
+
+
 def save_processed_data(df, params):
     """Save processed data"""
     processed_path = params['data']['processed_data_path']
@@ -143,8 +375,19 @@ def main():
     # Clean data
     df_clean = clean_data(df, params)
     
-    # Create customer features
-    customer_features = create_customer_features(df_clean, params)
+    # Create customer features (one row per customer, or per customer and cutoff date)
+    snapshots_enabled = params['preprocessing'].get('snapshots', {}).get('enabled', False)
+    if snapshots_enabled:
+        customer_features = create_snapshot_features(df_clean, params)
+    else:
+        customer_features = create_customer_features(df_clean, params)
+    
+    # No basket features this run: record an empty transform so the output matches
+    if snapshots_enabled or not requested_basket_features(params):
+        save_basket_transform(None, params)
+    
+    # Keep the segment column for per-segment models
+    customer_features = add_segment_column(customer_features, df_clean, params)
     
     # Save processed data
     save_processed_data(customer_features, params)
@@ -0,0 +1,218 @@
+"""
+Data Profiling Module
+Single-pass (optionally sampled) column statistics written as structured JSON per stage
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Verbosity levels for params['data_profiling']['verbosity']
+VERBOSITY_OFF = 0
+VERBOSITY_JSON = 1
+VERBOSITY_TEXT = 2
+
+
+class ColumnStats:
+    """Mergeable running statistics for a single column"""
+
+    def __init__(self, max_categories):
+        self.max_categories = max_categories
+        self.dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.value_counts = {}
+        self.high_cardinality = False
+
+    def update(self, values):
+        """Fold a chunk of values (a pandas Series) into the running statistics"""
+        if self.dtype is None:
+            self.dtype = str(values.dtype)
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            self._update_numeric(values)
+        else:
+            self._update_discrete(values)
+
+    def _update_range(self, chunk_min, chunk_max):
+        """Fold a chunk's min/max into the running range"""
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+    def _update_numeric(self, values):
+        """Moments and range from one float64 copy of the chunk (NumPy reductions, no pandas masks)"""
+        array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        null_mask = np.isnan(array)
+        n_null = int(null_mask.sum())
+        self.nulls += n_null
+        present = array[~null_mask] if n_null else array
+        n = len(present)
+        if n == 0:
+            return
+
+        chunk_mean = present.sum() / n
+        centered = present - chunk_mean
+        chunk_m2 = float(centered @ centered)
+        # Chan et al. parallel update of mean / sum of squared deviations
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta ** 2 * self.count * n / total
+        self._update_range(present.min(), present.max())
+        self.count += n
+
+        if not self.high_cardinality:
+            self._merge_counts(values.value_counts(sort=False))
+
+    def _update_discrete(self, values):
+        """Nulls, counts and range from a single value_counts over the chunk"""
+        chunk_counts = values.value_counts(dropna=False, sort=False)
+        null_keys = chunk_counts.index.isna()
+        n_null = int(chunk_counts[null_keys].sum())
+        self.nulls += n_null
+        # Drop nulls and unobserved categories of a categorical dtype
+        chunk_counts = chunk_counts[~null_keys & (chunk_counts.to_numpy() > 0)]
+        n = len(values) - n_null
+        if n == 0:
+            return
+
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Range over the distinct values only
+            self._update_range(chunk_counts.index.min(), chunk_counts.index.max())
+        self.count += n
+
+        if not self.high_cardinality:
+            self._merge_counts(chunk_counts)
+
+    def _merge_counts(self, chunk_counts):
+        """Merge a chunk's value counts, giving up once the column is high-cardinality"""
+        if len(chunk_counts) > self.max_categories:
+            # Stop tracking; the column is not categorical enough to be useful
+            self.high_cardinality = True
+            self.value_counts = {}
+            return
+        for value, value_count in chunk_counts.items():
+            key = str(value)
+            self.value_counts[key] = self.value_counts.get(key, 0) + int(value_count)
+        if len(self.value_counts) > self.max_categories:
+            self.high_cardinality = True
+            self.value_counts = {}
+
+    def to_dict(self):
+        """Return the statistics as a JSON-serializable dict"""
+        stats = {'dtype': self.dtype, 'count': self.count, 'nulls': self.nulls}
+        if self.min is not None:
+            is_numeric = isinstance(self.min, (int, float, np.number))
+            if is_numeric:
+                stats['mean'] = float(self.mean)
+                stats['std'] = float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+                stats['min'] = float(self.min)
+                stats['max'] = float(self.max)
+            else:
+                stats['min'] = str(self.min)
+                stats['max'] = str(self.max)
+        if not self.high_cardinality:
+            stats['value_counts'] = dict(sorted(self.value_counts.items(), key=lambda item: -item[1]))
+        return stats
+
+
+class StreamingProfile:
+    """Accumulates per-column statistics over a stream of DataFrame chunks"""
+
+    def __init__(self, max_categories=20):
+        self.max_categories = max_categories
+        self.n_rows = 0
+        self.columns = {}
+
+    def update(self, chunk, columns=None):
+        """Fold one DataFrame chunk into the profile"""
+        columns = columns if columns is not None else chunk.columns
+        for column in columns:
+            if column not in self.columns:
+                self.columns[column] = ColumnStats(self.max_categories)
+            self.columns[column].update(chunk[column])
+        self.n_rows += len(chunk)
+
+    def to_dict(self):
+        """Return the profile as a JSON-serializable dict"""
+        return {
+            'n_rows': self.n_rows,
+            'columns': {str(column): stats.to_dict() for column, stats in self.columns.items()},
+        }
+
+
+def profile_frame(df, columns=None, chunk_size=100000, sample_rows=None, max_categories=20, random_state=42):
+    """Profile a DataFrame in a single chunked pass, optionally on a row sample
+
+    With a sample, counts and value counts describe the sample; ``total_rows``
+    is always the size of the full frame.
+    """
+    total_rows = len(df)
+    sampled = sample_rows is not None and total_rows > sample_rows
+    if sampled:
+        rng = np.random.default_rng(random_state)
+        # Sorted positions keep the sample in row order (cheaper take, stable output)
+        positions = np.sort(rng.choice(len(df), size=sample_rows, replace=False))
+        df = df.iloc[positions]
+
+    profile = StreamingProfile(max_categories=max_categories)
+    for start in range(0, len(df), chunk_size):
+        profile.update(df.iloc[start:start + chunk_size], columns=columns)
+
+    result = profile.to_dict()
+    result['sampled'] = sampled
+    result['total_rows'] = total_rows
+    return result
+
+
+def log_data_profile(df, stage, params, columns=None):
+    """Profile a stage's frame according to params['data_profiling'] and save it as JSON
+
+    Verbosity 0 skips profiling entirely, 1 writes only the JSON profile and 2
+    additionally renders a text summary in the logs.
+    """
+    config = params.get('data_profiling', {}) or {}
+    verbosity = config.get('verbosity', VERBOSITY_JSON)
+    if verbosity <= VERBOSITY_OFF:
+        return None
+
+    profile = profile_frame(
+        df,
+        columns=columns,
+        chunk_size=config.get('chunk_size', 100000),
+        sample_rows=config.get('sample_rows'),
+        max_categories=config.get('max_categories', 20),
+        random_state=params.get('data', {}).get('random_state', 42),
+    )
+
+    output_dir = config.get('output_dir', 'models/data_profiles')
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{stage}.json")
+    with open(output_path, 'w') as f:
+        json.dump(profile, f, indent=4)
+    logger.info(f"Data profile for {stage} saved to {output_path}")
+
+    if verbosity >= VERBOSITY_TEXT:
+        head = df[columns].head() if columns is not None else df.head()
+        summary = pd.DataFrame({
+            column: {key: value for key, value in stats.items() if key != 'value_counts'}
+            for column, stats in profile['columns'].items()
+        }).T
+        logger.info(f"\nFirst few rows:\n{head}")
+        logger.info(f"\nColumn profile ({profile['n_rows']} rows, sampled={profile['sampled']}):\n{summary}")
+        for column, stats in profile['columns'].items():
+            if stats.get('value_counts') and len(stats['value_counts']) <= 10:
+                logger.info(f"\n{column} distribution: {stats['value_counts']}")
+
+    return profile
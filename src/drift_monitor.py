@@ -0,0 +1,212 @@
+"""
+Drift Monitor Module
+Compares streamed scoring inputs with fixed-bin training histograms (PSI / KS)
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_params(params_path='params.yaml'):
+    """Load parameters from yaml file"""
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def _bin_counts(values, edges, dtype='float64'):
+    """Counts of ``values`` in the bins (-inf, e_0], (e_0, e_1], ..., (e_k, inf) plus missing values
+
+    Values are first cast to ``dtype``, the precision the edges were computed
+    in, so a value equal to an edge (e.g. a tied discrete value) lands in the
+    same bin whether it was read from the float32 arrays or parsed from CSV.
+    """
+    values = np.asarray(values, dtype=dtype).astype(np.float64)
+    missing = np.isnan(values)
+    bins = np.searchsorted(edges, values[~missing], side='left')
+    return np.bincount(bins, minlength=len(edges) + 1), int(missing.sum())
+
+
+def build_reference_histograms(X, features, n_bins=10):
+    """Fixed-bin histograms of the training features
+
+    Bin edges are the training quantiles of each feature (duplicates removed),
+    with open outer bins so any scoring value falls in some bin. Each feature
+    records its dtype; scoring values are cast to it before binning.
+    """
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    reference = {}
+    for feature in features:
+        dtype = str(np.asarray(X[feature][:0]).dtype)
+        values = np.asarray(X[feature], dtype=np.float64)
+        observed = values[~np.isnan(values)]
+        # method='lower' keeps every edge an observed (representable) value
+        edges = np.unique(np.quantile(observed, quantiles, method='lower')) if len(observed) else np.array([])
+        counts, missing = _bin_counts(values, edges, dtype)
+        reference[feature] = {
+            'dtype': dtype,
+            'edges': edges.tolist(),
+            'counts': counts.tolist(),
+            'missing': missing,
+        }
+    return reference
+
+
+def save_reference_histograms(reference, output_path='models/reference_histograms.json'):
+    """Save reference histograms to JSON"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(reference, f, indent=4)
+    logger.info(f"Reference histograms for {len(reference)} features saved to {output_path}")
+
+
+def load_reference_histograms(path='models/reference_histograms.json'):
+    """Load reference histograms saved at training time"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def population_stability_index(reference_counts, current_counts, epsilon=1e-4):
+    """PSI between two histograms over the same bins (empty bins smoothed by ``epsilon``)"""
+    expected = np.maximum(reference_counts / max(reference_counts.sum(), 1), epsilon)
+    actual = np.maximum(current_counts / max(current_counts.sum(), 1), epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks_statistic(reference_counts, current_counts):
+    """Kolmogorov-Smirnov statistic evaluated at the bin edges
+
+    The CDFs are only known at the edges, so this is a lower bound on the
+    exact two-sample statistic that tightens as the number of bins grows.
+    """
+    reference_cdf = np.cumsum(reference_counts) / max(reference_counts.sum(), 1)
+    current_cdf = np.cumsum(current_counts) / max(current_counts.sum(), 1)
+    return float(np.max(np.abs(reference_cdf - current_cdf)))
+
+
+class DriftMonitor:
+    """Incremental per-feature histograms of scoring batches compared with the training reference
+
+    Only the bin counts are kept, so memory is O(features x bins) however many
+    rows are streamed through ``update``.
+    """
+
+    def __init__(self, reference, psi_threshold=0.2, ks_threshold=0.1):
+        self.features = list(reference)
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self._edges = {feature: np.asarray(reference[feature]['edges'], dtype=np.float64) for feature in self.features}
+        self._dtypes = {feature: reference[feature].get('dtype', 'float64') for feature in self.features}
+        self._reference = {feature: np.asarray(reference[feature]['counts'], dtype=np.int64) for feature in self.features}
+        self._counts = {feature: np.zeros_like(counts) for feature, counts in self._reference.items()}
+        self._missing = dict.fromkeys(self.features, 0)
+        self.n_rows = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Create a monitor from a saved reference histogram file"""
+        return cls(load_reference_histograms(path), **kwargs)
+
+    def update(self, batch):
+        """Add a batch of scoring inputs (DataFrame with the reference features)"""
+        for feature in self.features:
+            counts, missing = _bin_counts(batch[feature], self._edges[feature], self._dtypes[feature])
+            self._counts[feature] += counts
+            self._missing[feature] += missing
+        self.n_rows += len(batch)
+
+    def metrics(self):
+        """PSI and KS per feature plus a summary over all features"""
+        features = {}
+        for feature in self.features:
+            psi = population_stability_index(self._reference[feature], self._counts[feature])
+            ks = binned_ks_statistic(self._reference[feature], self._counts[feature])
+            features[feature] = {
+                'psi': psi,
+                'ks': ks,
+                'missing_rate': self._missing[feature] / self.n_rows if self.n_rows else 0.0,
+                'drifted': psi > self.psi_threshold or ks > self.ks_threshold,
+            }
+
+        return {
+            'n_rows': self.n_rows,
+            'max_psi': max((m['psi'] for m in features.values()), default=0.0),
+            'max_ks': max((m['ks'] for m in features.values()), default=0.0),
+            'n_drifted_features': sum(m['drifted'] for m in features.values()),
+            'features': features,
+        }
+
+
+def save_drift_metrics(metrics, output_path='models/drift_metrics.json'):
+    """Save drift metrics to JSON file"""
+    with open(output_path, 'w') as f:
+        json.dump(metrics, f, indent=4)
+    logger.info(f"Drift metrics saved to {output_path}")
+
+
+def log_drift_to_mlflow(metrics, params):
+    """Log drift metrics to the latest run of the experiment"""
+    import mlflow
+
+    experiment_name = params['mlflow']['experiment_name']
+    mlflow.set_experiment(experiment_name)
+    runs = mlflow.search_runs(experiment_names=[experiment_name], order_by=["start_time DESC"], max_results=1)
+    if len(runs) == 0:
+        logger.warning("No MLflow run found, skipping drift metric logging")
+        return
+
+    run_id = runs.iloc[0]['run_id']
+    with mlflow.start_run(run_id=run_id):
+        mlflow.log_metric("drift_max_psi", metrics['max_psi'])
+        mlflow.log_metric("drift_max_ks", metrics['max_ks'])
+        mlflow.log_metric("drift_n_drifted_features", metrics['n_drifted_features'])
+        for feature, feature_metrics in metrics['features'].items():
+            mlflow.log_metric(f"drift_psi_{feature}", feature_metrics['psi'])
+            mlflow.log_metric(f"drift_ks_{feature}", feature_metrics['ks'])
+    logger.info(f"Drift metrics logged to MLflow run: {run_id}")
+
+
+def main():
+    """Main execution function"""
+    logger.info("Starting drift monitoring stage...")
+
+    # Load parameters
+    params = load_params()
+    config = params['monitoring']
+
+    monitor = DriftMonitor.from_file(
+        config['reference_path'],
+        psi_threshold=config['psi_threshold'],
+        ks_threshold=config['ks_threshold'],
+    )
+
+    # Stream scoring inputs in chunks; only the histograms are kept in memory
+    scoring_path = config['scoring_data_path']
+    logger.info(f"Streaming scoring inputs from {scoring_path} in chunks of {config['chunk_size']}")
+    for batch in pd.read_csv(scoring_path, usecols=monitor.features, chunksize=config['chunk_size']):
+        monitor.update(batch)
+
+    metrics = monitor.metrics()
+    for feature, feature_metrics in metrics['features'].items():
+        flag = " (DRIFT)" if feature_metrics['drifted'] else ""
+        logger.info(f"{feature}: PSI={feature_metrics['psi']:.4f}, KS={feature_metrics['ks']:.4f}{flag}")
+    logger.info(f"{metrics['n_drifted_features']} of {len(monitor.features)} features drifted "
+                f"over {metrics['n_rows']} rows")
+
+    save_drift_metrics(metrics, config['output_path'])
+    log_drift_to_mlflow(metrics, params)
+
+    logger.info("Drift monitoring completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,13 @@ import numpy as np
 import yaml
 import logging
 import os
+import json
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import joblib
+from profiling import profile_stage
+from data_profiling import log_data_profile
+from customer_hashing import hash_test_mask
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -45,60 +49,151 @@ def select_features(df, params):
     
     logger.info(f"Feature matrix shape: {X.shape}")
     logger.info(f"Target shape: {y.shape}")
-    logger.info(f"Target distribution:\n{y.value_counts()}")
+    log_data_profile(df, 'select_features', params, columns=available_features + [target])
     
     return X, y
 
 
-def handle_missing_values(X):
-    """Handle any missing values in features"""
+def handle_missing_values(X, fill_values):
+    """Fill missing values with per-column training means
+
+    ``fill_values`` is the ``mean_`` of the fitted scaler (whose statistics skip
+    missing values), so a missing value becomes 0 after scaling. Batch,
+    streaming and prediction-time scoring all apply this rule.
+    """
     logger.info("Handling missing values...")
     
     missing_counts = X.isnull().sum()
     if missing_counts.sum() > 0:
         logger.warning(f"Found missing values:\n{missing_counts[missing_counts > 0]}")
-        # Fill with median for numerical columns
-        X = X.fillna(X.median())
-        logger.info("Missing values filled with median")
+        X = X.fillna(pd.Series(np.asarray(fill_values), index=X.columns))
+        logger.info("Missing values filled with training means")
     else:
         logger.info("No missing values found")
     
     return X
 
 
+def save_scaler(scaler, scaler_path='models/scaler.pkl'):
+    """Save fitted scaler"""
+    os.makedirs(os.path.dirname(scaler_path), exist_ok=True)
+    joblib.dump(scaler, scaler_path)
+    logger.info(f"Scaler saved to {scaler_path}")
+
+
+def transform_in_chunks(scaler, X, chunk_size, dtype):
+    """Apply a fitted scaler chunk by chunk into a preallocated array of ``dtype``"""
+    X_scaled = np.empty(X.shape, dtype=dtype)
+    for start in range(0, len(X), chunk_size):
+        X_scaled[start:start + chunk_size] = scaler.transform(X.iloc[start:start + chunk_size].astype(dtype))
+    return X_scaled
+
+
+@profile_stage
 def scale_features(X_train, X_test, params):
-    """Scale features using StandardScaler"""
+    """Scale features using StandardScaler
+
+    Features are cast to ``feature_engineering.dtype`` (float32 by default) before
+    scaling. With ``feature_engineering.chunk_size`` set, the scaler statistics are
+    fitted with ``partial_fit`` and applied chunk by chunk, so no full-size float64
+    copy of the feature tables is ever made. The scaler is fitted on the observed
+    values; missing values are then filled with the training means (see
+    ``handle_missing_values``) before the transform.
+    """
     logger.info("Scaling features...")
     
+    dtype = params['feature_engineering'].get('dtype', 'float64')
+    chunk_size = params['feature_engineering'].get('chunk_size')
+    
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    if chunk_size:
+        logger.info(f"Fitting scaler incrementally in chunks of {chunk_size} rows")
+        for start in range(0, len(X_train), chunk_size):
+            scaler.partial_fit(X_train.iloc[start:start + chunk_size].astype(dtype))
+    else:
+        scaler.fit(X_train.astype(dtype))
+    
+    X_train = handle_missing_values(X_train, scaler.mean_)
+    X_test = handle_missing_values(X_test, scaler.mean_)
+    if chunk_size:
+        X_train_scaled = transform_in_chunks(scaler, X_train, chunk_size, dtype)
+        X_test_scaled = transform_in_chunks(scaler, X_test, chunk_size, dtype)
+    else:
+        X_train_scaled = scaler.transform(X_train.astype(dtype))
+        X_test_scaled = scaler.transform(X_test.astype(dtype))
     
     # Convert back to DataFrame
-    X_train_scaled = pd.DataFrame(X_train_scaled, columns=X_train.columns, index=X_train.index)
-    X_test_scaled = pd.DataFrame(X_test_scaled, columns=X_test.columns, index=X_test.index)
+    X_train_scaled = pd.DataFrame(X_train_scaled, columns=X_train.columns, index=X_train.index, copy=False)
+    X_test_scaled = pd.DataFrame(X_test_scaled, columns=X_test.columns, index=X_test.index, copy=False)
     
     # Save scaler
-    os.makedirs('models', exist_ok=True)
-    scaler_path = 'models/scaler.pkl'
-    joblib.dump(scaler, scaler_path)
-    logger.info(f"Scaler saved to {scaler_path}")
+    save_scaler(scaler)
     
     logger.info("Feature scaling completed")
     
     return X_train_scaled, X_test_scaled, scaler
 
 
-def split_data(X, y, params):
+def check_split_balance(train_counts, test_counts, params):
+    """Warn when a class share differs between train and test by more than the tolerance
+
+    Takes per-class row counts (``y.value_counts()``) so streamed splits can pass
+    counts accumulated over chunks.
+    """
+    tolerance = params['data'].get('split_tolerance', 0.02)
+    train_share = train_counts / train_counts.sum()
+    test_share = test_counts / test_counts.sum()
+    
+    balanced = True
+    for label in train_share.index.union(test_share.index):
+        difference = abs(train_share.get(label, 0.0) - test_share.get(label, 0.0))
+        if difference > tolerance:
+            logger.warning(f"Class {label} share differs by {difference:.4f} between train and test "
+                           f"(tolerance {tolerance})")
+            balanced = False
+    return balanced
+
+
+def hash_split_chunks(chunks, params, id_column='CustomerID'):
+    """Split a stream of DataFrame chunks into (train_chunk, test_chunk) pairs
+
+    Each row is assigned by the hash of its CustomerID alone, so chunk boundaries
+    and data refreshes never move a customer between train and test.
+    """
+    for chunk in chunks:
+        is_test = hash_test_mask(chunk[id_column], params)
+        yield chunk[~is_test], chunk[is_test]
+
+
+@profile_stage
+def split_data(X, y, params, customer_ids=None):
     """Split data into train and test sets"""
     logger.info("Splitting data into train and test sets...")
     
     test_size = params['data']['test_size']
     random_state = params['data']['random_state']
+    split_method = params['data'].get('split_method', 'stratified')
     
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state, stratify=y
-    )
+    # Snapshots repeat each customer once per cutoff; a row-level split would put
+    # the same customer in both train and test
+    snapshots = params.get('preprocessing', {}).get('snapshots', {}) or {}
+    if snapshots.get('enabled', False) and split_method != 'hash':
+        raise ValueError("Snapshot features require data.split_method: hash "
+                         "(keeps all of a customer's snapshots on the same side of the split)")
+    
+    if split_method == 'hash':
+        if customer_ids is None:
+            raise ValueError("Hash split requires customer_ids")
+        is_test = hash_test_mask(customer_ids, params)
+        X_train, X_test = X[~is_test], X[is_test]
+        y_train, y_test = y[~is_test], y[is_test]
+        check_split_balance(y_train.value_counts(), y_test.value_counts(), params)
+    elif split_method == 'stratified':
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=random_state, stratify=y
+        )
+    else:
+        raise ValueError(f"Unknown split method: {split_method}")
     
     logger.info(f"Train set shape: X={X_train.shape}, y={y_train.shape}")
     logger.info(f"Test set shape: X={X_test.shape}, y={y_test.shape}")
@@ -129,6 +224,188 @@ def save_train_test_data(X_train, X_test, y_train, y_test, params):
     logger.info(f"Test data saved to {test_path}")
 
 
+def create_feature_arrays(columns, n_train, n_test, params):
+    """Create contiguous .npy feature/target files plus a column manifest
+
+    Returns writable memory-mapped arrays keyed ``train_X``, ``train_y``,
+    ``train_ids``, ``test_X``, ``test_y`` and ``test_ids`` that callers fill in
+    place. ``*_ids`` holds the CustomerID of every row.
+    """
+    arrays_dir = params['data']['arrays_dir']
+    dtype = params['feature_engineering'].get('dtype', 'float64')
+    os.makedirs(arrays_dir, exist_ok=True)
+    
+    shapes = {'train': n_train, 'test': n_test}
+    arrays = {}
+    for split, n_rows in shapes.items():
+        arrays[f'{split}_X'] = np.lib.format.open_memmap(
+            os.path.join(arrays_dir, f'{split}_X.npy'), mode='w+', dtype=dtype, shape=(n_rows, len(columns))
+        )
+        arrays[f'{split}_y'] = np.lib.format.open_memmap(
+            os.path.join(arrays_dir, f'{split}_y.npy'), mode='w+', dtype=np.int32, shape=(n_rows,)
+        )
+        arrays[f'{split}_ids'] = np.lib.format.open_memmap(
+            os.path.join(arrays_dir, f'{split}_ids.npy'), mode='w+', dtype=np.int64, shape=(n_rows,)
+        )
+    
+    manifest = {
+        'columns': list(columns),
+        'target_column': params['feature_engineering']['target_column'],
+        'dtype': str(np.dtype(dtype)),
+        'n_train': int(n_train),
+        'n_test': int(n_test),
+    }
+    with open(os.path.join(arrays_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    
+    return arrays
+
+
+def save_feature_arrays(X_train, X_test, y_train, y_test, train_ids, test_ids, params):
+    """Save train and test data (and the CustomerID of each row) as memory-mappable .npy arrays"""
+    arrays = create_feature_arrays(X_train.columns, len(X_train), len(X_test), params)
+    arrays['train_X'][:] = X_train.to_numpy()
+    arrays['train_y'][:] = y_train.to_numpy()
+    arrays['train_ids'][:] = np.asarray(train_ids)
+    arrays['test_X'][:] = X_test.to_numpy()
+    arrays['test_y'][:] = y_test.to_numpy()
+    arrays['test_ids'][:] = np.asarray(test_ids)
+    for array in arrays.values():
+        array.flush()
+    
+    logger.info(f"Feature arrays saved to {params['data']['arrays_dir']}")
+
+
+def load_feature_arrays(split, params, mmap_mode='r'):
+    """Open the ``train`` or ``test`` feature/target arrays with memory mapping
+
+    With ``mmap_mode='r'`` loading is near-instant and every process opening the
+    same files shares one page-cache copy instead of holding its own.
+    """
+    arrays_dir = params['data']['arrays_dir']
+    with open(os.path.join(arrays_dir, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    
+    X = np.load(os.path.join(arrays_dir, f'{split}_X.npy'), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(arrays_dir, f'{split}_y.npy'), mmap_mode=mmap_mode)
+    
+    return X, y, manifest['columns']
+
+
+def load_customer_ids(split, params, mmap_mode='r'):
+    """Open the CustomerID of every row of a split (aligned with its feature arrays)"""
+    return np.load(os.path.join(params['data']['arrays_dir'], f'{split}_ids.npy'), mmap_mode=mmap_mode)
+
+
+def segment_column(params):
+    """Segment column name when per-segment models are enabled, else None"""
+    config = params['model'].get('segmentation', {})
+    return config['column'] if config.get('enabled', False) else None
+
+
+def save_segment_labels(split, segments, params):
+    """Save the segment label of every row of a split next to its feature arrays"""
+    path = os.path.join(params['data']['arrays_dir'], f'{split}_segments.npy')
+    np.save(path, np.asarray(segments, dtype=str))
+    logger.info(f"Segment labels saved to {path}")
+
+
+def load_segment_labels(split, params):
+    """Load the segment labels of a split"""
+    return np.load(os.path.join(params['data']['arrays_dir'], f'{split}_segments.npy'))
+
+
+@profile_stage
+def stream_feature_engineering(params):
+    """Split, scale and save the processed data without loading it into memory
+
+    Two passes over ``processed_data.csv`` in chunks of
+    ``feature_engineering.chunk_size`` rows: the first hash-splits each chunk and
+    fits the scaler on the train rows with ``partial_fit``, the second applies the
+    scaler and appends each chunk straight to the train/test CSVs. Requires
+    ``data.split_method: hash`` because a stratified split needs every row at once.
+    Missing values are imputed with the training mean, as in
+    ``handle_missing_values``: filling 0 after scaling is the same rule.
+    """
+    logger.info("Streaming feature engineering...")
+    
+    if params['data'].get('split_method', 'stratified') != 'hash':
+        raise ValueError("Streaming feature engineering requires data.split_method: hash")
+    
+    processed_path = params['data']['processed_data_path']
+    chunk_size = params['feature_engineering']['chunk_size']
+    dtype = params['feature_engineering'].get('dtype', 'float64')
+    target = params['feature_engineering']['target_column']
+    
+    columns = pd.read_csv(processed_path, nrows=0).columns
+    features = [f for f in params['feature_engineering']['features'] if f in columns]
+    missing_features = [f for f in params['feature_engineering']['features'] if f not in columns]
+    if missing_features:
+        logger.warning(f"Missing features: {missing_features}")
+    logger.info(f"Selected features: {features}")
+    
+    segment_col = segment_column(params)
+    extra_columns = [segment_col] if segment_col else []
+    
+    def read_chunks():
+        return pd.read_csv(
+            processed_path, chunksize=chunk_size, usecols=['CustomerID'] + features + [target] + extra_columns
+        )
+    
+    # Pass 1: fit scaler statistics on the train rows
+    scaler = StandardScaler()
+    train_counts = pd.Series(dtype=np.int64)
+    test_counts = pd.Series(dtype=np.int64)
+    for train_chunk, test_chunk in hash_split_chunks(read_chunks(), params):
+        if len(train_chunk):
+            scaler.partial_fit(train_chunk[features].astype(dtype))
+        train_counts = train_counts.add(train_chunk[target].value_counts(), fill_value=0)
+        test_counts = test_counts.add(test_chunk[target].value_counts(), fill_value=0)
+    
+    logger.info(f"Train rows: {int(train_counts.sum())}, test rows: {int(test_counts.sum())}")
+    check_split_balance(train_counts, test_counts, params)
+    save_scaler(scaler)
+    
+    # Pass 2: transform each chunk and append it to the output files
+    train_path = params['data']['train_data_path']
+    test_path = params['data']['test_data_path']
+    os.makedirs(os.path.dirname(train_path), exist_ok=True)
+    for path in (train_path, test_path):
+        pd.DataFrame(columns=features + [target]).to_csv(path, index=False)
+    
+    arrays = create_feature_arrays(features, int(train_counts.sum()), int(test_counts.sum()), params)
+    offsets = {'train': 0, 'test': 0}
+    segments = {'train': [], 'test': []}
+    
+    for train_chunk, test_chunk in hash_split_chunks(read_chunks(), params):
+        for split, chunk, path in (('train', train_chunk, train_path), ('test', test_chunk, test_path)):
+            if not len(chunk):
+                continue
+            X_scaled = np.nan_to_num(scaler.transform(chunk[features].astype(dtype)), nan=0.0)
+            output = pd.DataFrame(X_scaled, columns=features, copy=False)
+            output[target] = chunk[target].to_numpy()
+            output.to_csv(path, mode='a', header=False, index=False)
+            
+            start, end = offsets[split], offsets[split] + len(chunk)
+            arrays[f'{split}_X'][start:end] = X_scaled
+            arrays[f'{split}_y'][start:end] = output[target].to_numpy()
+            arrays[f'{split}_ids'][start:end] = chunk['CustomerID'].to_numpy()
+            offsets[split] = end
+            if segment_col:
+                segments[split].append(chunk[segment_col].astype(str).to_numpy())
+    
+    for array in arrays.values():
+        array.flush()
+    
+    if segment_col:
+        for split, parts in segments.items():
+            save_segment_labels(split, np.concatenate(parts) if parts else np.array([], dtype=str), params)
+    
+    logger.info(f"Train data saved to {train_path}")
+    logger.info(f"Test data saved to {test_path}")
+    logger.info(f"Feature arrays saved to {params['data']['arrays_dir']}")
+
+
 def main():
     """Main execution function"""
     logger.info("Starting feature engineering stage...")
@@ -136,6 +413,12 @@ def main():
     # Load parameters
     params = load_params()
     
+    # Stream the data chunk by chunk when it does not need to be held in memory
+    if params['feature_engineering'].get('chunk_size') and params['data'].get('split_method') == 'hash':
+        stream_feature_engineering(params)
+        logger.info("Feature engineering completed successfully!")
+        return
+    
     # Load processed data
     processed_path = params['data']['processed_data_path']
     logger.info(f"Loading processed data from {processed_path}")
@@ -144,17 +427,24 @@ def main():
     # Select features
     X, y = select_features(df, params)
     
-    # Handle missing values
-    X = handle_missing_values(X)
-    
     # Split data
-    X_train, X_test, y_train, y_test = split_data(X, y, params)
+    X_train, X_test, y_train, y_test = split_data(X, y, params, customer_ids=df['CustomerID'])
     
     # Scale features
     X_train_scaled, X_test_scaled, scaler = scale_features(X_train, X_test, params)
     
     # Save train and test data
     save_train_test_data(X_train_scaled, X_test_scaled, y_train, y_test, params)
+    save_feature_arrays(
+        X_train_scaled, X_test_scaled, y_train, y_test,
+        df.loc[X_train.index, 'CustomerID'], df.loc[X_test.index, 'CustomerID'], params,
+    )
+    
+    # Save segment labels for per-segment models
+    segment_col = segment_column(params)
+    if segment_col:
+        save_segment_labels('train', df.loc[X_train.index, segment_col].astype(str), params)
+        save_segment_labels('test', df.loc[X_test.index, segment_col].astype(str), params)
     
     logger.info("Feature engineering completed successfully!")
 
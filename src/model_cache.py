@@ -0,0 +1,135 @@
+"""
+Model Cache Module
+Keeps several model versions resident at once with LRU eviction by total size
+"""
+
+import glob
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def resolve_model_path(model_id, tracking_uri='mlruns'):
+    """Resolve a logged-model id, run id or file path to a model.pkl path
+
+    Looks for ``<tracking_uri>/<experiment>/models/<model_id>/artifacts/model.pkl``
+    (MLflow logged models) and ``<tracking_uri>/<experiment>/<run_id>/artifacts/model.pkl``
+    (run artifacts).
+    """
+    if os.path.isfile(model_id):
+        return model_id
+
+    patterns = [
+        os.path.join(tracking_uri, '*', 'models', model_id, 'artifacts', 'model.pkl'),
+        os.path.join(tracking_uri, '*', model_id, 'artifacts', 'model.pkl'),
+    ]
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if matches:
+            return matches[0]
+
+    raise FileNotFoundError(f"No model.pkl found for model id {model_id} under {tracking_uri}")
+
+
+def list_model_versions(tracking_uri='mlruns'):
+    """Map every logged-model id under the tracking directory to its model.pkl path"""
+    paths = glob.glob(os.path.join(tracking_uri, '*', 'models', '*', 'artifacts', 'model.pkl'))
+    return {path.split(os.sep)[-3]: path for path in sorted(paths)}
+
+
+class ModelCache:
+    """LRU cache of loaded models bounded by total resident bytes
+
+    Models are loaded with ``joblib.load(..., mmap_mode=...)``. Memory mapping
+    only applies to files written with ``joblib.dump`` (such as
+    ``models/model.pkl`` and ``models/segment_models.pkl``): their NumPy arrays
+    are mapped rather than copied. MLflow's ``model.pkl`` artifacts are
+    cloudpickle files and load fully into memory whatever ``mmap_mode`` is.
+    The size of a model is estimated from its file size.
+    """
+
+    def __init__(self, max_bytes=1024 ** 3, tracking_uri='mlruns', mmap_mode='r'):
+        self.max_bytes = max_bytes
+        self.tracking_uri = tracking_uri
+        self.mmap_mode = mmap_mode
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times = {}
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a cache from the ``model_cache`` and ``mlflow`` sections of params"""
+        config = params.get('model_cache', {}) or {}
+        return cls(
+            max_bytes=config.get('max_bytes', 1024 ** 3),
+            tracking_uri=params.get('mlflow', {}).get('tracking_uri', 'mlruns'),
+            mmap_mode=config.get('mmap_mode', 'r'),
+        )
+
+    def get(self, model_id):
+        """Return the model for ``model_id``, loading it on a miss"""
+        with self._lock:
+            if model_id in self._entries:
+                self._entries.move_to_end(model_id)
+                self.hits += 1
+                return self._entries[model_id][0]
+            self.misses += 1
+
+            path = resolve_model_path(model_id, self.tracking_uri)
+            start = time.perf_counter()
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            self.load_times[model_id] = time.perf_counter() - start
+            nbytes = os.path.getsize(path)
+            logger.info(f"Loaded model {model_id} from {path} in {self.load_times[model_id]:.3f}s")
+
+            self._entries[model_id] = (model, nbytes)
+            self.resident_bytes += nbytes
+            self._evict()
+            return model
+
+    def _evict(self):
+        """Drop least recently used models until within max_bytes (always keep the newest)"""
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            model_id, (_, nbytes) = self._entries.popitem(last=False)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+            logger.info(f"Evicted model {model_id} ({nbytes} bytes)")
+
+    def invalidate(self, model_id):
+        """Remove a model from the cache (e.g. after its artifact changed)"""
+        with self._lock:
+            entry = self._entries.pop(model_id, None)
+            if entry is not None:
+                self.resident_bytes -= entry[1]
+
+    def __contains__(self, model_id):
+        return model_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit rate, load times and residency statistics"""
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'resident_models': len(self._entries),
+            'resident_bytes': self.resident_bytes,
+            'total_load_time_s': sum(self.load_times.values()),
+            'load_times_s': dict(self.load_times),
+        }
@@ -15,11 +15,14 @@ from sklearn.metrics import (
     f1_score, roc_auc_score, confusion_matrix,
     classification_report, roc_curve
 )
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import cross_validate
 import joblib
 import json
 import matplotlib.pyplot as plt
 import seaborn as sns
+from profiling import profile_stage, log_profile_to_mlflow
+from feature_engineering import load_feature_arrays, segment_column, load_segment_labels
+from model_cache import ModelCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,13 +36,16 @@ def load_params(params_path='params.yaml'):
     return params
 
 
-def load_model(model_path='models/model.pkl'):
-    """Load trained model"""
+def load_model(model_path='models/model.pkl', cache=None):
+    """Load trained model (through a ModelCache when given)"""
+    if cache is not None:
+        return cache.get(model_path)
     logger.info(f"Loading model from {model_path}")
     model = joblib.load(model_path)
     return model
 
 
+@profile_stage
 def evaluate_model(model, X_test, y_test, params):
     """Evaluate model and calculate metrics"""
     logger.info("Evaluating model...")
@@ -80,33 +86,27 @@ def evaluate_model(model, X_test, y_test, params):
     return metrics, y_pred, y_pred_proba, cm
 
 
+@profile_stage
 def cross_validate_model(model, X_train, y_train, params):
-    """Perform cross-validation"""
+    """Perform cross-validation
+
+    All metrics are scored from a single set of fold fits. Passing memory-mapped
+    arrays lets the ``evaluation.cv_n_jobs`` worker processes share the training
+    data through the page cache instead of each receiving a pickled copy.
+    """
     logger.info("Performing cross-validation...")
     
     cv_folds = params['evaluation']['cv_folds']
+    n_jobs = params['evaluation'].get('cv_n_jobs', 1)
     
-    cv_scores = {}
-    
-    # Accuracy
-    scores = cross_val_score(model, X_train, y_train, cv=cv_folds, scoring='accuracy')
-    cv_scores['cv_accuracy_mean'] = scores.mean()
-    cv_scores['cv_accuracy_std'] = scores.std()
-    
-    # Precision
-    scores = cross_val_score(model, X_train, y_train, cv=cv_folds, scoring='precision')
-    cv_scores['cv_precision_mean'] = scores.mean()
-    cv_scores['cv_precision_std'] = scores.std()
-    
-    # Recall
-    scores = cross_val_score(model, X_train, y_train, cv=cv_folds, scoring='recall')
-    cv_scores['cv_recall_mean'] = scores.mean()
-    cv_scores['cv_recall_std'] = scores.std()
+    scoring = {'accuracy': 'accuracy', 'precision': 'precision', 'recall': 'recall', 'f1': 'f1'}
+    results = cross_validate(model, X_train, y_train, cv=cv_folds, scoring=scoring, n_jobs=n_jobs)
     
-    # F1
-    scores = cross_val_score(model, X_train, y_train, cv=cv_folds, scoring='f1')
-    cv_scores['cv_f1_mean'] = scores.mean()
-    cv_scores['cv_f1_std'] = scores.std()
+    cv_scores = {}
+    for metric_name in scoring:
+        scores = results[f'test_{metric_name}']
+        cv_scores[f'cv_{metric_name}_mean'] = scores.mean()
+        cv_scores[f'cv_{metric_name}_std'] = scores.std()
     
     logger.info(f"\nCross-Validation Results ({cv_folds} folds):")
     for metric_name, metric_value in cv_scores.items():
@@ -148,7 +148,7 @@ def plot_roc_curve(y_test, y_pred_proba, output_path='models/roc_curve.png'):
     logger.info(f"ROC curve plot saved to {output_path}")
 
 
-def log_to_mlflow(metrics, cv_scores):
+def log_to_mlflow(metrics, cv_scores, profile_dir=None):
     """Log metrics to MLflow"""
     logger.info("Logging metrics to MLflow...")
     
@@ -178,6 +178,10 @@ def log_to_mlflow(metrics, cv_scores):
             if os.path.exists('models/feature_importance.csv'):
                 mlflow.log_artifact('models/feature_importance.csv')
             
+            # Log per-stage profiling records
+            if profile_dir:
+                log_profile_to_mlflow(profile_dir)
+            
             logger.info(f"Metrics logged to MLflow run: {run_id}")
 
 
@@ -198,29 +202,31 @@ def main():
     # Load parameters
     params = load_params()
     
-    # Load test data
-    test_path = params['data']['test_data_path']
-    logger.info(f"Loading test data from {test_path}")
-    test_data = pd.read_csv(test_path)
+    # Load test and train data (memory-mapped)
+    logger.info(f"Loading feature arrays from {params['data']['arrays_dir']}")
+    X_test, y_test, columns = load_feature_arrays('test', params)
+    X_test = pd.DataFrame(X_test, columns=columns, copy=False)
     
-    # Load train data for cross-validation
-    train_path = params['data']['train_data_path']
-    logger.info(f"Loading train data from {train_path}")
-    train_data = pd.read_csv(train_path)
+    # Train arrays stay plain memmaps so CV workers share them
+    X_train, y_train, _ = load_feature_arrays('train', params)
     
-    # Separate features and target
-    target_col = params['feature_engineering']['target_column']
-    X_test = test_data.drop(target_col, axis=1)
-    y_test = test_data[target_col]
-    X_train = train_data.drop(target_col, axis=1)
-    y_train = train_data[target_col]
-    
-    # Load model
-    model = load_model()
+    # Load models through the cache (memory-maps the arrays of joblib dumps)
+    model_cache = ModelCache.from_params(params)
+    model = load_model(cache=model_cache)
     
     # Evaluate model
     metrics, y_pred, y_pred_proba, cm = evaluate_model(model, X_test, y_test, params)
     
+    # Evaluate segment-routed models
+    if segment_column(params):
+        segment_path = params['model']['segmentation']['output_path']
+        segmented_model = load_model(segment_path, cache=model_cache)
+        test_segments = load_segment_labels('test', params)
+        segmented_metrics, _, _, _ = evaluate_model(
+            segmented_model.for_segments(test_segments), X_test, y_test, params
+        )
+        metrics.update({f"segmented_{name}": value for name, value in segmented_metrics.items()})
+    
     # Cross-validation
     cv_scores = cross_validate_model(model, X_train, y_train, params)
     
@@ -233,7 +239,9 @@ def main():
     save_metrics(metrics, cv_scores)
     
     # Log to MLflow
-    log_to_mlflow(metrics, cv_scores)
+    profiling = params.get('profiling', {})
+    profile_dir = profiling.get('output_dir') if profiling.get('enabled') else None
+    log_to_mlflow(metrics, cv_scores, profile_dir)
     
     logger.info("Model evaluation completed successfully!")
 
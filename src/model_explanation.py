@@ -0,0 +1,221 @@
+"""
+Model Explanation Module
+Per-customer feature contributions computed in chunks across worker processes
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import yaml
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from scipy import sparse
+
+from feature_engineering import load_feature_arrays, load_customer_ids, segment_column, load_segment_labels
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Per-process state set by the pool initializer
+_worker = {}
+
+
+def load_params(params_path='params.yaml'):
+    """Load parameters from yaml file"""
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def _tree_path_attribution(tree, n_features, positive_class):
+    """Sparse (nodes x features) matrix of probability changes along each tree edge
+
+    Entering a node adds ``value[node] - value[parent]`` to the feature split on
+    at the parent; summing those rows along a sample's decision path gives its
+    path-based (Saabas) contributions for this tree.
+    """
+    value = tree.value[:, 0, :]
+    probability = value[:, positive_class] / value.sum(axis=1)
+
+    parent = np.full(tree.node_count, -1, dtype=np.int64)
+    internal = np.flatnonzero(tree.children_left >= 0)
+    parent[tree.children_left[internal]] = internal
+    parent[tree.children_right[internal]] = internal
+
+    children = np.flatnonzero(parent >= 0)
+    delta = probability[children] - probability[parent[children]]
+    attribution = sparse.csr_matrix(
+        (delta, (children, tree.feature[parent[children]])), shape=(tree.node_count, n_features)
+    )
+    return attribution, probability[0]
+
+
+def random_forest_contributions(model, X):
+    """Path-based attribution for a RandomForest, averaged over trees (probability units)"""
+    n_features = X.shape[1]
+    positive_class = int(np.flatnonzero(model.classes_ == 1)[0]) if 1 in model.classes_ else 1
+    contributions = np.zeros((X.shape[0], n_features + 1), dtype=np.float64)
+
+    for estimator in model.estimators_:
+        attribution, bias = _tree_path_attribution(estimator.tree_, n_features, positive_class)
+        paths = estimator.decision_path(X)
+        contributions[:, :n_features] += (paths @ attribution).toarray()
+        contributions[:, n_features] += bias
+
+    return contributions / len(model.estimators_)
+
+
+def compute_contributions(model, X, columns):
+    """Per-row feature contributions with the bias term as the last column"""
+    if isinstance(model, xgb.XGBClassifier):
+        # Native TreeSHAP (log-odds units)
+        dmatrix = xgb.DMatrix(X, feature_names=list(columns))
+        return model.get_booster().predict(dmatrix, pred_contribs=True)
+    if isinstance(model, RandomForestClassifier):
+        return random_forest_contributions(model, np.asarray(X, dtype=np.float32))
+    if isinstance(model, LogisticRegression):
+        # Exact linear attribution (log-odds units)
+        contributions = np.asarray(X, dtype=np.float64) * model.coef_[0]
+        bias = np.full((contributions.shape[0], 1), model.intercept_[0])
+        return np.hstack([contributions, bias])
+    raise ValueError(f"Explanations are not supported for {type(model).__name__}")
+
+
+def explained_splits(split):
+    """Feature-array splits covered by ``explanation.split`` (``all`` = every scored customer)"""
+    return ['train', 'test'] if split == 'all' else [split]
+
+
+def customer_ids_path(output_path):
+    """Path of the CustomerID array written next to the contributions"""
+    return os.path.splitext(output_path)[0] + '_customer_ids.npy'
+
+
+def _single_threaded(model):
+    """Limit a model to one thread; chunks already run in parallel processes"""
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    return model
+
+
+def _init_worker(model_path, params, splits, output_path):
+    """Load the model(s) and open the shared input/output memory maps once per process
+
+    With segmentation enabled, rows are explained by the model that scores
+    them: the segment router from ``model.segmentation.output_path``.
+    """
+    _worker['model'] = _single_threaded(joblib.load(model_path))
+    _worker['router'] = None
+    _worker['segments'] = {}
+    if segment_column(params):
+        router = joblib.load(params['model']['segmentation']['output_path'])
+        for model in router.segment_models.values():
+            _single_threaded(model)
+        router.global_model = _worker['model']
+        _worker['router'] = router
+        _worker['segments'] = {split: load_segment_labels(split, params) for split in splits}
+
+    _worker['X'] = {}
+    for split in splits:
+        _worker['X'][split], _, _worker['columns'] = load_feature_arrays(split, params)
+    _worker['output'] = np.load(output_path, mmap_mode='r+')
+
+
+def _explain_chunk(split, start, stop, offset):
+    """Worker: explain rows [start, stop) of a split and write them at ``offset`` in the output file"""
+    X_chunk = pd.DataFrame(_worker['X'][split][start:stop], columns=_worker['columns'])
+    output = _worker['output'][offset:offset + stop - start]
+    router = _worker['router']
+    if router is None:
+        output[:] = compute_contributions(_worker['model'], X_chunk, _worker['columns'])
+    else:
+        # Each row is explained by its segment's model (global model for other segments)
+        segments = np.asarray(_worker['segments'][split][start:stop], dtype=str)
+        for segment in np.unique(segments):
+            rows = np.flatnonzero(segments == segment)
+            model = router.segment_models.get(segment, router.global_model)
+            output[rows] = compute_contributions(model, X_chunk.iloc[rows], _worker['columns'])
+    _worker['output'].flush()
+    return stop - start
+
+
+def explain(params, model_path='models/model.pkl'):
+    """Explain every row of the configured split(s) in bounded-size chunks across workers
+
+    Row i of the output belongs to the customer in row i of the CustomerID
+    array saved alongside it (train rows first, then test rows for ``all``).
+    """
+    config = params['explanation']
+    split = config.get('split', 'all')
+    splits = explained_splits(split)
+    output_path = config['output_path']
+    chunk_size = config['chunk_size']
+
+    # Rows to explain, laid out split after split in the output
+    customer_ids = [np.asarray(load_customer_ids(s, params)) for s in splits]
+    _, _, columns = load_feature_arrays(splits[0], params)
+    tasks = []
+    offset = 0
+    for s, ids in zip(splits, customer_ids):
+        for start in range(0, len(ids), chunk_size):
+            stop = min(start + chunk_size, len(ids))
+            tasks.append((s, start, stop, offset + start))
+        offset += len(ids)
+    n_rows = offset
+    logger.info(f"Explaining {n_rows} rows ({split}) in chunks of {chunk_size}...")
+
+    # Compact float32 output, preallocated so workers write disjoint row ranges in place
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    output = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(n_rows, len(columns) + 1))
+    del output
+    np.save(customer_ids_path(output_path), np.concatenate(customer_ids))
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=config['n_jobs'],
+        initializer=_init_worker,
+        initargs=(model_path, params, splits, output_path),
+    ) as executor:
+        futures = [executor.submit(_explain_chunk, *task) for task in tasks]
+        explained = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Explained {explained} rows in {elapsed:.2f}s ({explained / max(elapsed, 1e-9):.0f} rows/s)")
+
+    manifest = {
+        'columns': list(columns) + ['bias'],
+        'split': split,
+        'customer_ids_path': customer_ids_path(output_path),
+        'algorithm': params['model']['algorithm'],
+        'model': 'segment_router' if segment_column(params) else 'global',
+        'units': 'probability' if params['model']['algorithm'] == 'random_forest' else 'log_odds',
+        'n_rows': int(n_rows),
+    }
+    manifest_path = os.path.splitext(output_path)[0] + '.json'
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    logger.info(f"Explanations saved to {output_path} (manifest: {manifest_path})")
+
+
+def main():
+    """Main execution function"""
+    logger.info("Starting model explanation stage...")
+
+    # Load parameters
+    params = load_params()
+
+    # Explain predictions
+    explain(params)
+
+    logger.info("Model explanation completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
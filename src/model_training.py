@@ -14,6 +14,10 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from xgboost import XGBClassifier
 import joblib
+from profiling import profile_stage
+from feature_engineering import load_feature_arrays, segment_column, load_segment_labels
+from segment_models import SegmentedModel, train_segment_models
+from drift_monitor import build_reference_histograms, save_reference_histograms
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -47,8 +51,13 @@ def get_model(params):
     return model, model_params
 
 
-def train_model(X_train, y_train, params):
-    """Train the model with MLflow tracking"""
+@profile_stage
+def train_model(X_train, y_train, params, segments=None):
+    """Train the model with MLflow tracking
+
+    When ``segments`` are given, per-segment models are also trained (see
+    ``segment_models.train_segment_models``) and saved alongside the global model.
+    """
     logger.info("Starting model training...")
     
     # Setup MLflow
@@ -66,6 +75,11 @@ def train_model(X_train, y_train, params):
         mlflow.log_param("n_features", X_train.shape[1])
         mlflow.log_param("n_samples", X_train.shape[0])
         
+        # Flag runs trained on a customer sample (development mode)
+        sample_fraction = params['data'].get('sample_fraction', 1.0)
+        mlflow.log_param("sample_fraction", sample_fraction)
+        mlflow.set_tag("sampled", str(sample_fraction < 1.0).lower())
+        
         # Log feature names
         mlflow.log_param("features", list(X_train.columns))
         
@@ -99,6 +113,19 @@ def train_model(X_train, y_train, params):
         
         mlflow.log_artifact(model_path)
         
+        # Per-segment models, falling back to this global model for small segments.
+        # Without segmentation the router holds only the global model, so the
+        # (DVC-tracked) file always matches the current run.
+        if segments is not None:
+            segmented_model, timing = train_segment_models(model, segments, params)
+            mlflow.log_metrics(timing)
+            mlflow.log_param("segment_column", segmented_model.segment_column)
+        else:
+            segmented_model = SegmentedModel(model, {}, None)
+        segment_path = params['model']['segmentation']['output_path']
+        joblib.dump(segmented_model, segment_path)
+        logger.info(f"Segment models saved to {segment_path}")
+        
         run_id = mlflow.active_run().info.run_id
         logger.info(f"MLflow run ID: {run_id}")
     
@@ -112,20 +139,23 @@ def main():
     # Load parameters
     params = load_params()
     
-    # Load training data
-    train_path = params['data']['train_data_path']
-    logger.info(f"Loading training data from {train_path}")
-    train_data = pd.read_csv(train_path)
-    
-    # Separate features and target
-    target_col = params['feature_engineering']['target_column']
-    X_train = train_data.drop(target_col, axis=1)
-    y_train = train_data[target_col]
+    # Load training data (memory-mapped; the DataFrame is a view, not a copy)
+    logger.info(f"Loading training arrays from {params['data']['arrays_dir']}")
+    X, y_train, columns = load_feature_arrays('train', params)
+    X_train = pd.DataFrame(X, columns=columns, copy=False)
     
     logger.info(f"Training data shape: X={X_train.shape}, y={y_train.shape}")
     
+    # Segment labels for per-segment models
+    segments = load_segment_labels('train', params) if segment_column(params) else None
+    
     # Train model
-    model = train_model(X_train, y_train, params)
+    model = train_model(X_train, y_train, params, segments=segments)
+    
+    # Reference histograms of the training features for drift monitoring
+    monitoring = params['monitoring']
+    reference = build_reference_histograms(X_train, list(X_train.columns), monitoring['n_bins'])
+    save_reference_histograms(reference, monitoring['reference_path'])
     
     logger.info("Model training completed successfully!")
 
@@ -0,0 +1,157 @@
+"""
+Prediction Cache Module
+Caches purchase probabilities per (model version, customer feature fingerprint)
+"""
+
+import logging
+import os
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_engineering import handle_missing_values
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def feature_fingerprints(customer_features, features, dtype='float32'):
+    """Vectorized 64-bit hash of each row's feature values
+
+    Values are cast to ``dtype`` first, so the same numbers stored as int or
+    float hash identically.
+    """
+    return pd.util.hash_pandas_object(customer_features[features].astype(dtype), index=False).to_numpy()
+
+
+class PredictionCache:
+    """Size-bounded LRU cache in front of the scaler + model
+
+    Rows are keyed by (model version, fingerprint of the feature vector from
+    ``create_customer_features``). The model version is derived from the model
+    and scaler files, so replacing either clears the cache; a customer whose
+    features change gets a new fingerprint and its previous entry is dropped.
+    Missing values are imputed with the training means, as in training, and
+    the customer -> fingerprint map is bounded by ``max_entries`` as well.
+    """
+
+    def __init__(self, features, model_path='models/model.pkl', scaler_path='models/scaler.pkl',
+                 max_entries=100000, dtype='float32', model_cache=None):
+        self.features = list(features)
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self.model_cache = model_cache
+        self.model = None
+        self.scaler = None
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._customer_fingerprints = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _file_version(self):
+        """Version tag from the model and scaler file metadata"""
+        model_stat = os.stat(self.model_path)
+        scaler_stat = os.stat(self.scaler_path)
+        return (model_stat.st_mtime_ns, model_stat.st_size, scaler_stat.st_mtime_ns, scaler_stat.st_size)
+
+    def _refresh_model(self):
+        """(Re)load the model and scaler if their files changed, clearing stale predictions"""
+        version = self._file_version()
+        if version == self.model_version:
+            return
+
+        if self.model_version is not None:
+            logger.info("Model or scaler file changed, invalidating prediction cache")
+            self.invalidations += 1
+            self.clear()
+
+        if self.model_cache is not None:
+            self.model_cache.invalidate(self.model_path)
+            self.model = self.model_cache.get(self.model_path)
+        else:
+            self.model = joblib.load(self.model_path)
+        self.scaler = joblib.load(self.scaler_path)
+        self.model_version = version
+
+    def clear(self):
+        """Drop all cached predictions"""
+        self._entries.clear()
+        self._customer_fingerprints.clear()
+
+    def predict_proba(self, customer_features):
+        """Purchase probability for each row of a customer feature table
+
+        Cached rows are answered from the cache; all misses are scaled and scored
+        in a single batch.
+        """
+        self._refresh_model()
+
+        fingerprints = feature_fingerprints(customer_features, self.features, self.dtype)
+        customer_ids = (customer_features['CustomerID'].to_numpy()
+                        if 'CustomerID' in customer_features else None)
+
+        probabilities = np.empty(len(customer_features), dtype=np.float64)
+        miss_rows = []
+        for row, fingerprint in enumerate(fingerprints):
+            key = (self.model_version, fingerprint)
+            cached = self._entries.get(key)
+            if cached is None:
+                miss_rows.append(row)
+            else:
+                self._entries.move_to_end(key)
+                probabilities[row] = cached[0]
+
+        self.hits += len(customer_features) - len(miss_rows)
+        self.misses += len(miss_rows)
+
+        if miss_rows:
+            X = customer_features[self.features].iloc[miss_rows]
+            X = handle_missing_values(X, self.scaler.mean_).astype(self.dtype)
+            X_scaled = pd.DataFrame(self.scaler.transform(X), columns=self.features)
+            miss_probabilities = self.model.predict_proba(X_scaled)[:, 1]
+            probabilities[miss_rows] = miss_probabilities
+
+            for row, probability in zip(miss_rows, miss_probabilities):
+                fingerprint = fingerprints[row]
+                customer_id = customer_ids[row] if customer_ids is not None else None
+                if customer_id is not None:
+                    # Features changed since this customer was last scored: drop the stale entry
+                    previous = self._customer_fingerprints.pop(customer_id, None)
+                    if previous is not None and previous != fingerprint:
+                        self._entries.pop((self.model_version, previous), None)
+                    self._customer_fingerprints[customer_id] = fingerprint
+                self._entries[(self.model_version, fingerprint)] = (probability, customer_id)
+                self._entries.move_to_end((self.model_version, fingerprint))
+
+            while len(self._entries) > self.max_entries:
+                (_, fingerprint), (_, customer_id) = self._entries.popitem(last=False)
+                # Evict the customer's mapping with its entry
+                if customer_id is not None and self._customer_fingerprints.get(customer_id) == fingerprint:
+                    del self._customer_fingerprints[customer_id]
+                self.evictions += 1
+            # Customers sharing a fingerprint with another customer are not tied to an entry
+            while len(self._customer_fingerprints) > self.max_entries:
+                self._customer_fingerprints.popitem(last=False)
+
+        return probabilities
+
+    def stats(self):
+        """Hit-rate metrics"""
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'tracked_customers': len(self._customer_fingerprints),
+        }
@@ -0,0 +1,232 @@
+"""
+Profiling Module
+Lightweight per-stage instrumentation (wall time, CPU time, peak RSS, throughput)
+"""
+
+import cProfile
+import functools
+import glob
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = 'models/profiles'
+
+# Profile files already started by this process (older records are discarded on first write)
+_started_paths = set()
+
+
+def get_peak_rss_mb():
+    """Return the peak resident set size of this process so far in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux only); return True on success"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _read_peak_rss_since_reset_mb():
+    """Peak RSS in MB since the last ``_reset_peak_rss`` (VmHWM)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def pipeline_stage_name():
+    """Name of the running pipeline stage, taken from the script (e.g. data_preprocessing)"""
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'interactive'
+
+
+def profile_path(config):
+    """Profile file owned by the running pipeline stage"""
+    output_dir = config.get('output_dir', DEFAULT_PROFILE_DIR)
+    return os.path.join(output_dir, f"{pipeline_stage_name()}.json")
+
+
+def _find_params(args, kwargs):
+    """Locate the params dict passed to a stage function"""
+    if isinstance(kwargs.get('params'), dict):
+        return kwargs['params']
+    for arg in reversed(args):
+        if isinstance(arg, dict):
+            return arg
+    return {}
+
+
+def _count_rows(args, result):
+    """Count rows processed by a stage (first tabular input, else the output)"""
+    for arg in args:
+        if hasattr(arg, 'shape') and len(arg.shape) > 0:
+            return int(arg.shape[0])
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'shape') and len(result.shape) > 0:
+        return int(result.shape[0])
+    return None
+
+
+def save_profile_record(stage, record, output_path):
+    """Merge a single stage record into the profile JSON file
+
+    The first record written by a process replaces the file, so records from
+    functions that no longer run (e.g. snapshot features after disabling
+    snapshots) do not linger.
+    """
+    profile = {}
+    if output_path in _started_paths and os.path.exists(output_path):
+        try:
+            with open(output_path, 'r') as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Could not read existing profile at {output_path}, overwriting")
+            profile = {}
+
+    profile[stage] = record
+    _started_paths.add(output_path)
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(profile, f, indent=4)
+
+
+def ensure_profile_file(config):
+    """Start an empty profile file for this stage when profiling is disabled
+
+    The per-stage files are DVC metrics, so they must exist even when nothing
+    is recorded.
+    """
+    output_path = profile_path(config)
+    if output_path in _started_paths:
+        return
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({}, f)
+    _started_paths.add(output_path)
+
+
+def profile_stage(func=None, *, name=None):
+    """Decorator recording wall time, CPU time, peak RSS and rows/sec for a stage
+
+    Behaviour is controlled by the ``profiling`` section of the params dict passed
+    to the wrapped function. Records go to ``<output_dir>/<pipeline stage>.json``,
+    one file per pipeline script. ``stage_peak_rss_mb`` is the peak RSS during
+    the call (Linux only, None elsewhere); ``process_peak_rss_mb`` is the
+    process-wide peak so far. With ``profiling.enabled: false`` the stage file
+    is still written, empty. When ``profiling.cprofile_stage`` matches the stage
+    name, the call is also run under cProfile and the stats are dumped to
+    ``<cprofile_dir>/<stage>.prof``.
+    """
+    if func is None:
+        return functools.partial(profile_stage, name=name)
+
+    stage = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        params = _find_params(args, kwargs)
+        config = params.get('profiling', {}) or {}
+        if not config.get('enabled', False):
+            if 'profiling' in params:
+                ensure_profile_file(config)
+            return func(*args, **kwargs)
+
+        profiler = None
+        if config.get('cprofile_stage') == stage:
+            profiler = cProfile.Profile()
+
+        process_peak_before = get_peak_rss_mb()
+        peak_reset = _reset_peak_rss()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+
+        rows = _count_rows(args, result)
+        stage_peak_mb = _read_peak_rss_since_reset_mb() if peak_reset else None
+        process_peak_mb = get_peak_rss_mb()
+        if process_peak_before is not None and process_peak_mb is not None:
+            # Resetting the counter also lowers ru_maxrss; keep the process-wide maximum
+            process_peak_mb = max(process_peak_before, process_peak_mb)
+        record = {
+            'wall_time_s': round(wall_time, 6),
+            'cpu_time_s': round(cpu_time, 6),
+            'stage_peak_rss_mb': round(stage_peak_mb, 2) if stage_peak_mb is not None else None,
+            'process_peak_rss_mb': round(process_peak_mb, 2) if process_peak_mb is not None else None,
+            'rows': rows,
+            'rows_per_s': round(rows / wall_time, 2) if rows and wall_time > 0 else None,
+        }
+        logger.info(f"[profile] {stage}: {record}")
+        save_profile_record(stage, record, profile_path(config))
+
+        if profiler is not None:
+            cprofile_dir = config.get('cprofile_dir', 'models/cprofile')
+            os.makedirs(cprofile_dir, exist_ok=True)
+            stats_path = os.path.join(cprofile_dir, f"{stage}.prof")
+            profiler.dump_stats(stats_path)
+            logger.info(f"cProfile stats for {stage} saved to {stats_path}")
+
+        return result
+
+    return wrapper
+
+
+def log_profile_to_mlflow(profile_dir=DEFAULT_PROFILE_DIR):
+    """Log every pipeline stage's profile records as metrics (and the JSON files as artifacts) to the active MLflow run"""
+    paths = sorted(glob.glob(os.path.join(profile_dir, '*.json')))
+    if not paths:
+        return
+
+    # Imported lazily so instrumenting data stages does not pull in MLflow
+    import mlflow
+
+    for path in paths:
+        with open(path, 'r') as f:
+            profile = json.load(f)
+
+        for stage, record in profile.items():
+            for metric_name, metric_value in record.items():
+                if metric_value is not None:
+                    mlflow.log_metric(f"profile.{stage}.{metric_name}", metric_value)
+
+        mlflow.log_artifact(path, artifact_path='profiles')
+    logger.info(f"Profile metrics logged to MLflow from {profile_dir}")
@@ -0,0 +1,149 @@
+"""
+Segment Models Module
+Per-segment models (e.g. per Country) trained concurrently, with global-model fallback
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import load_feature_arrays
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _take_rows(X, mask):
+    """Select rows of a DataFrame or array by boolean mask"""
+    return X.iloc[mask] if isinstance(X, pd.DataFrame) else X[mask]
+
+
+class SegmentedModel:
+    """Routes each row to its segment's model, or to the global model for other segments"""
+
+    def __init__(self, global_model, segment_models, segment_column):
+        self.global_model = global_model
+        self.segment_models = segment_models
+        self.segment_column = segment_column
+        self.classes_ = global_model.classes_
+
+    def predict_proba(self, X, segments):
+        """Class probabilities, each row scored by the model of its segment"""
+        segments = np.asarray(segments, dtype=str)
+        probabilities = np.empty((len(segments), len(self.classes_)), dtype=np.float64)
+
+        routed = np.zeros(len(segments), dtype=bool)
+        for segment, model in self.segment_models.items():
+            mask = segments == segment
+            if mask.any():
+                probabilities[mask] = model.predict_proba(_take_rows(X, mask))
+                routed |= mask
+        if not routed.all():
+            probabilities[~routed] = self.global_model.predict_proba(_take_rows(X, ~routed))
+
+        return probabilities
+
+    def predict(self, X, segments):
+        """Predicted class of each row"""
+        return self.classes_[np.argmax(self.predict_proba(X, segments), axis=1)]
+
+    def for_segments(self, segments):
+        """Bind segment labels so the model can be used where predict(X) is expected"""
+        return BoundSegmentedModel(self, segments)
+
+
+class BoundSegmentedModel:
+    """A SegmentedModel with fixed segment labels for a given X"""
+
+    def __init__(self, model, segments):
+        self.model = model
+        self.segments = segments
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X, self.segments)
+
+    def predict(self, X):
+        return self.model.predict(X, self.segments)
+
+
+def _fit_segment_model(segment, rows, params):
+    """Worker: fit one segment's model on its rows of the memory-mapped train arrays"""
+    # Imported here: model_training imports this module
+    from model_training import get_model
+
+    X, y, columns = load_feature_arrays('train', params)
+    model, _ = get_model(params)
+    # Segments already run in parallel; avoid oversubscribing cores inside each fit
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+
+    start = time.perf_counter()
+    model.fit(pd.DataFrame(X[rows], columns=columns), y[rows])
+    return segment, model, time.perf_counter() - start
+
+
+def train_segment_models(global_model, segments, params):
+    """Train one model per large-enough segment in a process pool
+
+    Segments with fewer than ``min_segment_size`` rows, or with a single class,
+    fall back to ``global_model``. Workers read the training data from the
+    memory-mapped arrays written by feature engineering, so only row indices are
+    sent to each process. Returns the SegmentedModel and a timing summary: the
+    parallel wall time and the sum of the per-segment fit times (measured while
+    the workers ran concurrently). With ``compare_sequential`` the same jobs are
+    then fitted one after another in this process (models discarded) to report
+    the sequential wall time and the speedup.
+    """
+    config = params['model']['segmentation']
+    min_size = config['min_segment_size']
+    segments = np.asarray(segments, dtype=str)
+    _, y, _ = load_feature_arrays('train', params)
+
+    jobs = []
+    for segment in map(str, np.unique(segments)):
+        rows = np.flatnonzero(segments == segment)
+        if len(rows) < min_size or len(np.unique(y[rows])) < 2:
+            logger.info(f"Segment '{segment}' ({len(rows)} rows) uses the global model")
+            continue
+        jobs.append((segment, rows))
+
+    logger.info(f"Training {len(jobs)} segment models with {config['n_jobs']} workers...")
+    segment_models = {}
+    fit_times = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=config['n_jobs']) as executor:
+        futures = [executor.submit(_fit_segment_model, segment, rows, params) for segment, rows in jobs]
+        for future in futures:
+            segment, model, fit_time = future.result()
+            segment_models[segment] = model
+            fit_times[segment] = fit_time
+            logger.info(f"Segment '{segment}' trained in {fit_time:.2f}s")
+    wall_time = time.perf_counter() - start
+
+    timing = {
+        'segment_models': len(segment_models),
+        'segment_training_wall_s': wall_time,
+        # Sum of the per-worker fit times; workers share the cores, so this is
+        # not what a sequential run would take
+        'segment_fit_time_sum_s': sum(fit_times.values()),
+    }
+    logger.info(f"Segment training took {wall_time:.2f}s "
+                f"(sum of concurrent fit times {timing['segment_fit_time_sum_s']:.2f}s)")
+
+    if config.get('compare_sequential', False):
+        logger.info("Timing a sequential pass over the same segments for comparison...")
+        start = time.perf_counter()
+        for segment, rows in jobs:
+            _fit_segment_model(segment, rows, params)
+        sequential_time = time.perf_counter() - start
+        timing['segment_training_sequential_s'] = sequential_time
+        timing['segment_training_speedup'] = sequential_time / max(wall_time, 1e-9)
+        logger.info(f"Sequential segment training took {sequential_time:.2f}s "
+                    f"(parallel speedup {timing['segment_training_speedup']:.2f}x)")
+
+    return SegmentedModel(global_model, segment_models, config['column']), timing